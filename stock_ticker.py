@@ -1,57 +1,108 @@
+import asyncio
 import heapq
+import itertools
+import math
 import random
+import sys
 import time
 import threading
-from datetime import datetime, timedelta
-from collections import defaultdict, deque
+from array import array
+from datetime import datetime
+from collections import defaultdict
 from typing import Dict, List, Tuple, Optional
 import os
 
 
+TOP_MOVERS = 25  # Gainers/losers kept in the cached market ranking
+HISTORY_LEN = 20  # Recent prices kept per stock for trend analysis
+ORDER_POOL_SIZE = 1024  # Max filled orders kept for reuse
+# Order book key sign per side: BUY keys are -price so both books are min-heaps
+BOOK_SIGN = {'BUY': -1.0, 'SELL': 1.0}
+
+
 class Stock:
     """Represents a stock with its properties"""
-    def __init__(self, symbol: str, name: str, current_price: float, volume: int = 0):
+    __slots__ = ('symbol', 'name', 'current_price', 'previous_price', 'volume',
+                 'last_updated', 'daily_high', 'daily_low',
+                 '_hist', '_hist_idx', '_row', '_base', '_hist_count',
+                 '_pct_change', '_trend')
+    
+    def __init__(self, symbol: str, name: str, current_price: float, volume: int = 0,
+                 history: Optional[array] = None, hist_idx: Optional[array] = None, row: int = 0):
         self.symbol = symbol
         self.name = name
         self.current_price = current_price
         self.previous_price = current_price
         self.volume = volume
-        self.price_history = deque(maxlen=20)  # Keep last 20 prices for trend
-        self.price_history.append(current_price)
-        self.last_updated = datetime.now()
+        self.last_updated = time.monotonic()
         self.daily_high = current_price
         self.daily_low = current_price
+        
+        # Price history ring buffer: one HISTORY_LEN row of a flat buffer shared
+        # by all stocks (owned by the ticker), or a private row if none is given
+        if history is None:
+            history = array('d', [0.0]) * HISTORY_LEN
+            hist_idx = array('i', [0])
+            row = 0
+        self._hist = history
+        self._hist_idx = hist_idx
+        self._row = row
+        self._base = row * HISTORY_LEN
+        self._hist_count = 1
+        history[self._base:self._base + HISTORY_LEN] = array('d', [current_price]) * HISTORY_LEN
+        hist_idx[row] = 1
+        
+        # Derived values cached on every price update
+        self._pct_change = 0.0
+        self._trend = "STABLE"
+    
+    @property
+    def price_history(self) -> List[float]:
+        """Recorded prices, oldest first"""
+        count = self._hist_count
+        end = self._hist_idx[self._row]
+        return [self._hist[self._base + (end - count + i) % HISTORY_LEN] for i in range(count)]
     
     def update_price(self, new_price: float, volume: int = 0):
         """Update stock price and maintain history"""
-        self.previous_price = self.current_price
+        prev = self.current_price
+        self.previous_price = prev
         self.current_price = new_price
         self.volume += volume
-        self.price_history.append(new_price)
-        self.last_updated = datetime.now()
+        self.last_updated = time.monotonic()
         
         # Update daily high/low
         self.daily_high = max(self.daily_high, new_price)
         self.daily_low = min(self.daily_low, new_price)
+        
+        # Append to the ring buffer, reading the two prior prices on the way
+        hist, base, row = self._hist, self._base, self._row
+        idx = self._hist_idx[row]
+        a = hist[base + (idx - 2) % HISTORY_LEN]
+        b = hist[base + (idx - 1) % HISTORY_LEN]
+        hist[base + idx] = new_price
+        self._hist_idx[row] = (idx + 1) % HISTORY_LEN
+        if self._hist_count < HISTORY_LEN:
+            self._hist_count += 1
+        
+        # Refresh cached percentage change and trend
+        self._pct_change = 0.0 if prev == 0 else (new_price - prev) / prev * 100
+        if self._hist_count < 3:
+            self._trend = "STABLE"
+        elif new_price > b > a:
+            self._trend = "📈 UPTREND"
+        elif new_price < b < a:
+            self._trend = "📉 DOWNTREND"
+        else:
+            self._trend = "📊 STABLE"
     
     def get_percentage_change(self) -> float:
-        """Calculate percentage change from previous price"""
-        if self.previous_price == 0:
-            return 0.0
-        return ((self.current_price - self.previous_price) / self.previous_price) * 100
+        """Get percentage change from previous price"""
+        return self._pct_change
     
     def get_trend(self) -> str:
         """Get price trend based on recent history"""
-        if len(self.price_history) < 3:
-            return "STABLE"
-        
-        recent = list(self.price_history)[-3:]
-        if recent[2] > recent[1] > recent[0]:
-            return "📈 UPTREND"
-        elif recent[2] < recent[1] < recent[0]:
-            return "📉 DOWNTREND"
-        else:
-            return "📊 STABLE"
+        return self._trend
     
     def __str__(self):
         change = self.get_percentage_change()
@@ -61,32 +112,28 @@ class Stock:
 
 class OrderBookEntry:
     """Represents an order in the order book"""
+    __slots__ = ('order_id', 'symbol', 'order_type', 'price', 'quantity', 'user_id')
+    
     def __init__(self, order_id: str, symbol: str, order_type: str, 
                  price: float, quantity: int, user_id: str = "USER"):
+        self.reset(order_id, symbol, order_type, price, quantity, user_id)
+    
+    def reset(self, order_id: str, symbol: str, order_type: str, 
+              price: float, quantity: int, user_id: str = "USER"):
+        """(Re)initialize all order fields, used when recycling pooled orders"""
         self.order_id = order_id
         self.symbol = symbol
         self.order_type = order_type  # 'BUY' or 'SELL'
         self.price = price
         self.quantity = quantity
         self.user_id = user_id
-        self.timestamp = datetime.now()
-    
-    def __lt__(self, other):
-        """Comparison for heap operations"""
-        if self.order_type == 'BUY':
-            # For buy orders: higher price has higher priority
-            if self.price != other.price:
-                return self.price > other.price
-            return self.timestamp < other.timestamp
-        else:
-            # For sell orders: lower price has higher priority
-            if self.price != other.price:
-                return self.price < other.price
-            return self.timestamp < other.timestamp
 
 
 class PriceAlert:
     """Represents a price alert"""
+    __slots__ = ('alert_id', 'symbol', 'target_price', 'alert_type', 'user_id',
+                 'created_at', 'triggered')
+    
     def __init__(self, alert_id: str, symbol: str, target_price: float, 
                  alert_type: str, user_id: str = "USER"):
         self.alert_id = alert_id
@@ -94,7 +141,7 @@ class PriceAlert:
         self.target_price = target_price
         self.alert_type = alert_type  # 'ABOVE' or 'BELOW'
         self.user_id = user_id
-        self.created_at = datetime.now()
+        self.created_at = time.monotonic()
         self.triggered = False
     
     def __lt__(self, other):
@@ -115,6 +162,38 @@ class PriceAlert:
         return False
 
 
+def random_walk(prices: array, k: int) -> List[Tuple[int, int]]:
+    """Move k random prices in place by -3% to +3% (floored at $1).
+    
+    Returns (row, volume) pairs for the rows that moved.
+    """
+    uniform, randint = random.uniform, random.randint
+    moved = []
+    for row in random.sample(range(len(prices)), k):
+        new_price = prices[row] * (1 + uniform(-3, 3) / 100)
+        prices[row] = new_price if new_price > 1.0 else 1.0  # Don't let stocks go below $1
+        moved.append((row, randint(1000, 50000)))
+    return moved
+
+
+def price_volatility(history: array, n_rows: int) -> List[float]:
+    """Volatility of each HISTORY_LEN row of a flat history buffer.
+    
+    Returns the population standard deviation of each row as a percentage
+    of its mean, so stocks at different price levels are comparable.
+    """
+    volatility = []
+    for base in range(0, n_rows * HISTORY_LEN, HISTORY_LEN):
+        row = history[base:base + HISTORY_LEN]
+        if min(row) == max(row):
+            volatility.append(0.0)  # Flat row; skip rounding noise in the mean
+            continue
+        mean = sum(row) / HISTORY_LEN
+        variance = sum((price - mean) ** 2 for price in row) / HISTORY_LEN
+        volatility.append(math.sqrt(variance) / mean * 100 if mean > 0 else 0.0)
+    return volatility
+
+
 class InteractiveStockTicker:
     """Interactive Stock Ticker System with User Control"""
     
@@ -122,16 +201,43 @@ class InteractiveStockTicker:
         # Stock data storage
         self.stocks: Dict[str, Stock] = {}
         
+        # Shared price history (one HISTORY_LEN row per stock) and symbol <-> row
+        self._history = array('d')
+        self._hist_idx = array('i')
+        self._sym_idx: Dict[str, int] = {}
+        self._symbol_list: List[str] = []
+        
+        # Current prices, update times and user holdings, one slot per row
+        self._prices = array('d')
+        self._last_updated = array('d')
+        self._qty = array('q')
+        
         # Heaps for market analysis
-        self.gainers_heap = []
-        self.losers_heap = []
-        self.volatile_heap = []
+        # Symbols whose price moved since the last ranking, the cached change per
+        # row, and the top TOP_MOVERS (change, row) entries in rank order
+        self._dirty_symbols = set()
+        self._changes = array('d')
+        self._gainers_top: List[Tuple[float, int]] = []
+        self._losers_top: List[Tuple[float, int]] = []
+        # Per-row volatility and a min-heap of (-volatility, row), most volatile at the root
+        self._volatility = array('d')
+        self.volatile_heap: List[Tuple[float, int]] = []
+        self._analytics_dirty = False  # Price history changed since the last analytics pass
         
         # Order book - separate heaps for buy/sell orders
+        # Entries are (key, seq, order) tuples: key is -price for BUY (max-heap)
+        # and price for SELL; seq breaks price ties in arrival (FIFO) order
         self.order_books: Dict[str, Dict[str, List]] = defaultdict(lambda: {'BUY': [], 'SELL': []})
+        self._order_seq = itertools.count()
+        self._order_pool: List[OrderBookEntry] = []  # Free list of filled orders
         
-        # Price alerts
-        self.price_alerts = []
+        # Cached top-of-book prices per symbol (-inf / inf when a side is empty)
+        self._best_bid: Dict[str, float] = {}
+        self._best_ask: Dict[str, float] = {}
+        
+        # Price alerts, indexed by symbol then type: ABOVE is a min-heap on
+        # target price, BELOW a min-heap on -target, so each root is the next to fire
+        self.price_alerts: Dict[str, Dict[str, List]] = defaultdict(lambda: {'ABOVE': [], 'BELOW': []})
         self.triggered_alerts = []
         
         # User portfolio and transaction history
@@ -139,9 +245,16 @@ class InteractiveStockTicker:
         self.user_cash = 100000.0  # Starting with $100,000
         self.transaction_history = []
         
-        # Market simulation
+        # Cached portfolio value, recomputed only when flagged dirty
+        self._pv_dirty = True
+        self._pv_cache = 0.0
+        
+        # Output buffer for display frames, written with one call per frame
+        self._out: List[str] = []
+        
+        # Market simulation (a task on the session's event loop)
         self.market_open = False
-        self.simulation_thread = None
+        self.simulation_task: Optional[asyncio.Task] = None
         
         # Statistics
         self.total_operations = 0
@@ -166,29 +279,49 @@ class InteractiveStockTicker:
             ("INTC", "Intel Corp.", 55.90)
         ]
         
-        for symbol, name, price in initial_stocks:
-            self.stocks[symbol] = Stock(symbol, name, price)
-            self._update_market_heaps(symbol)
+        self._history = array('d', [0.0]) * (len(initial_stocks) * HISTORY_LEN)
+        self._hist_idx = array('i', [0]) * len(initial_stocks)
+        
+        for row, (symbol, name, price) in enumerate(initial_stocks):
+            self._sym_idx[symbol] = row
+            self._symbol_list.append(symbol)
+            self._prices.append(price)
+            self._qty.append(0)
+            self.stocks[symbol] = Stock(symbol, name, price, history=self._history,
+                                        hist_idx=self._hist_idx, row=row)
+            self._last_updated.append(self.stocks[symbol].last_updated)
+            self._changes.append(0.0)
+            self._dirty_symbols.add(symbol)
+        
+        self._compute_analytics()
     
-    def _update_market_heaps(self, symbol: str):
-        """Update market analysis heaps"""
+    def _apply_price(self, symbol: str, new_price: float, volume: int = 0):
+        """Record a new price and refresh everything derived from it"""
+        row = self._sym_idx[symbol]
         stock = self.stocks[symbol]
-        change_pct = stock.get_percentage_change()
-        
-        # Add to heaps (we'll clean them periodically to avoid infinite growth)
-        heapq.heappush(self.gainers_heap, (-change_pct, symbol, stock.current_price, datetime.now()))
-        heapq.heappush(self.losers_heap, (change_pct, symbol, stock.current_price, datetime.now()))
-        
-        self.total_operations += 2
-        
-        # Keep heaps manageable
-        if len(self.gainers_heap) > 50:
-            self.gainers_heap = sorted(self.gainers_heap)[-25:]
-            heapq.heapify(self.gainers_heap)
-        
-        if len(self.losers_heap) > 50:
-            self.losers_heap = self.losers_heap[:25]
-            heapq.heapify(self.losers_heap)
+        stock.update_price(new_price, volume)
+        self._prices[row] = new_price
+        self._last_updated[row] = stock.last_updated
+        self._dirty_symbols.add(symbol)
+        self._analytics_dirty = True
+        if self._qty[row] > 0:
+            self._pv_dirty = True
+    
+    def _adjust_position(self, symbol: str, quantity: int):
+        """Add (or with a negative quantity, remove) shares from the user's holdings"""
+        self.user_portfolio[symbol] += quantity
+        self._qty[self._sym_idx[symbol]] += quantity
+        self._pv_dirty = True
+    
+    def _println(self, line: str = ""):
+        """Buffer a line of display output"""
+        self._out.append(line)
+    
+    def _flush(self):
+        """Write all buffered display output in one call"""
+        if self._out:
+            sys.stdout.write('\n'.join(self._out) + '\n')
+            self._out.clear()
     
     def clear_screen(self):
         """Clear the console screen"""
@@ -196,82 +329,109 @@ class InteractiveStockTicker:
     
     def display_header(self):
         """Display system header"""
-        print("=" * 80)
-        print("🏛️  INTERACTIVE STOCK TICKER SYSTEM")
-        print("=" * 80)
+        self._println("=" * 80)
+        self._println("🏛️  INTERACTIVE STOCK TICKER SYSTEM")
+        self._println("=" * 80)
         market_status = "🟢 OPEN" if self.market_open else "🔴 CLOSED"
-        print(f"Market Status: {market_status} | Your Cash: ${self.user_cash:,.2f} | "
-              f"Portfolio Value: ${self.get_portfolio_value():,.2f}")
-        print("-" * 80)
+        self._println(f"Market Status: {market_status} | Your Cash: ${self.user_cash:,.2f} | "
+                      f"Portfolio Value: ${self.get_portfolio_value():,.2f}")
+        self._println("-" * 80)
+        
+        self._flush()
     
     def get_portfolio_value(self) -> float:
-        """Calculate current portfolio value"""
-        total_value = 0
-        for symbol, quantity in self.user_portfolio.items():
-            if symbol in self.stocks and quantity > 0:
-                total_value += self.stocks[symbol].current_price * quantity
+        """Get current portfolio value, recalculating only when invalidated"""
+        if not self._pv_dirty:
+            return self._pv_cache
+        
+        # Dot product of the aligned price and quantity arrays over held
+        # (positive) positions; _apply_price invalidates on the same condition
+        total_value = sum(price * qty for price, qty in zip(self._prices, self._qty) if qty > 0)
+        self._pv_cache = total_value
+        self._pv_dirty = False
         return total_value
     
     def display_stocks(self):
         """Display current stock prices"""
-        print("📊 CURRENT STOCK PRICES:")
-        print("-" * 50)
+        self._println("📊 CURRENT STOCK PRICES:")
+        self._println("-" * 50)
         for symbol, stock in sorted(self.stocks.items()):
             owned = self.user_portfolio.get(symbol, 0)
             ownership = f" (You own: {owned})" if owned > 0 else ""
-            print(f"  {stock}{ownership}")
+            self._println(f"  {stock}{ownership}")
+        
+        self._flush()
+    
+    def _refresh_market_movers(self):
+        """Recompute changes for dirty symbols and rebuild the top-K rankings"""
+        if not self._dirty_symbols:
+            return
+        
+        changes = self._changes
+        for symbol in self._dirty_symbols:
+            changes[self._sym_idx[symbol]] = self.stocks[symbol].get_percentage_change()
+        self._dirty_symbols.clear()
+        
+        # (change, row) entries: rows stand in for symbols so entries stay small
+        # and compare entirely in C; partial selection is O(N log K)
+        entries = list(zip(changes, range(len(changes))))
+        self._gainers_top = heapq.nlargest(TOP_MOVERS, entries)
+        self._losers_top = heapq.nsmallest(TOP_MOVERS, entries)
+        self.total_operations += 2
+    
+    def _compute_analytics(self):
+        """Recompute volatility for all stocks in one pass and rebuild the volatility heap"""
+        self._volatility = array('d', price_volatility(self._history, len(self._symbol_list)))
+        self.volatile_heap = [(-vol, row) for row, vol in enumerate(self._volatility)]
+        heapq.heapify(self.volatile_heap)
+        self._analytics_dirty = False
+        self.total_operations += 1
+    
+    def get_most_volatile(self, k: int = 5) -> List:
+        """Get the k stocks with the highest recent price volatility"""
+        if self._analytics_dirty:
+            self._compute_analytics()
+        return [(self._symbol_list[row], -neg_vol, self._prices[row])
+                for neg_vol, row in heapq.nsmallest(k, self.volatile_heap) if neg_vol < 0]
     
     def get_market_leaders(self, k: int = 5) -> Tuple[List, List]:
-        """Get top gainers and losers efficiently using heaps"""
-        # Get gainers (clean up old entries)
-        gainers = []
-        temp_gainers = []
-        current_time = datetime.now()
-        
-        while self.gainers_heap and len(gainers) < k:
-            neg_change, symbol, price, timestamp = heapq.heappop(self.gainers_heap)
-            # Only consider recent entries (last 5 minutes)
-            if (current_time - timestamp).seconds < 300 and symbol in self.stocks:
-                gainers.append((symbol, -neg_change, self.stocks[symbol].current_price))
-                temp_gainers.append((neg_change, symbol, price, timestamp))
-        
-        # Restore heap
-        for item in temp_gainers:
-            heapq.heappush(self.gainers_heap, item)
-        
-        # Get losers
-        losers = []
-        temp_losers = []
-        
-        while self.losers_heap and len(losers) < k:
-            change, symbol, price, timestamp = heapq.heappop(self.losers_heap)
-            if (current_time - timestamp).seconds < 300 and symbol in self.stocks:
-                losers.append((symbol, change, self.stocks[symbol].current_price))
-                temp_losers.append((change, symbol, price, timestamp))
-        
-        # Restore heap
-        for item in temp_losers:
-            heapq.heappush(self.losers_heap, item)
-        
-        return gainers, losers
+        """Get top gainers and losers from the cached market ranking"""
+        self._refresh_market_movers()
+        
+        # Only consider recent updates (last 5 minutes)
+        cutoff = time.monotonic() - 300.0
+        last_updated, symbols, prices = self._last_updated, self._symbol_list, self._prices
+        
+        def top(ranking: List[Tuple[float, int]]) -> List:
+            leaders = []
+            for change, row in ranking:
+                if last_updated[row] > cutoff:
+                    leaders.append((symbols[row], change, prices[row]))
+                    if len(leaders) == k:
+                        break
+            return leaders
+        
+        return top(self._gainers_top), top(self._losers_top)
     
     def display_market_movers(self):
         """Display market leaders"""
         gainers, losers = self.get_market_leaders()
         
-        print("\n🚀 TOP GAINERS:")
+        self._println("\n🚀 TOP GAINERS:")
         for i, (symbol, change, price) in enumerate(gainers, 1):
-            print(f"  {i}. {symbol}: ${price:.2f} (+{change:.2f}%)")
+            self._println(f"  {i}. {symbol}: ${price:.2f} (+{change:.2f}%)")
         
         if not gainers:
-            print("  No significant gainers yet.")
+            self._println("  No significant gainers yet.")
         
-        print("\n📉 TOP LOSERS:")
+        self._println("\n📉 TOP LOSERS:")
         for i, (symbol, change, price) in enumerate(losers, 1):
-            print(f"  {i}. {symbol}: ${price:.2f} ({change:.2f}%)")
+            self._println(f"  {i}. {symbol}: ${price:.2f} ({change:.2f}%)")
         
         if not losers:
-            print("  No significant losers yet.")
+            self._println("  No significant losers yet.")
+        
+        self._flush()
     
     def buy_stock(self, symbol: str, quantity: int) -> bool:
         """Buy stock directly at market price"""
@@ -288,7 +448,7 @@ class InteractiveStockTicker:
         
         # Execute purchase
         self.user_cash -= total_cost
-        self.user_portfolio[symbol] += quantity
+        self._adjust_position(symbol, quantity)
         
         # Record transaction
         transaction = {
@@ -321,7 +481,7 @@ class InteractiveStockTicker:
         
         # Execute sale
         self.user_cash += total_revenue
-        self.user_portfolio[symbol] -= quantity
+        self._adjust_position(symbol, -quantity)
         
         # Record transaction
         transaction = {
@@ -357,10 +517,12 @@ class InteractiveStockTicker:
                 return False
         
         order_id = f"{order_type}_{symbol}_{int(time.time())}"
-        order = OrderBookEntry(order_id, symbol, order_type, price, quantity)
+        order = self._acquire_order(order_id, symbol, order_type, price, quantity)
         
         # Add to order book heap
-        heapq.heappush(self.order_books[symbol][order_type], order)
+        key = BOOK_SIGN[order_type] * price
+        heapq.heappush(self.order_books[symbol][order_type], (key, next(self._order_seq), order))
+        self._refresh_best_prices(symbol)
         self.orders_placed += 1
         self.total_operations += 1
         
@@ -370,59 +532,85 @@ class InteractiveStockTicker:
         self._match_orders(symbol)
         return True
     
+    def _acquire_order(self, order_id: str, symbol: str, order_type: str,
+                       price: float, quantity: int, user_id: str = "USER") -> OrderBookEntry:
+        """Get an order from the free list, or allocate one if it is empty"""
+        if self._order_pool:
+            order = self._order_pool.pop()
+            order.reset(order_id, symbol, order_type, price, quantity, user_id)
+            return order
+        return OrderBookEntry(order_id, symbol, order_type, price, quantity, user_id)
+    
+    def _release_order(self, order: OrderBookEntry):
+        """Return a fully filled order to the free list"""
+        if len(self._order_pool) < ORDER_POOL_SIZE:
+            self._order_pool.append(order)
+    
+    def _refresh_best_prices(self, symbol: str):
+        """Re-read the cached best bid/ask from the top of the order book"""
+        book = self.order_books[symbol]
+        buy_orders, sell_orders = book['BUY'], book['SELL']
+        self._best_bid[symbol] = -buy_orders[0][0] if buy_orders else -math.inf
+        self._best_ask[symbol] = sell_orders[0][0] if sell_orders else math.inf
+    
     def _match_orders(self, symbol: str):
         """Match buy and sell orders for a symbol"""
+        # Nothing can match unless the book is crossed (best bid >= best ask)
+        if self._best_bid.get(symbol, -math.inf) < self._best_ask.get(symbol, math.inf):
+            return
+        
         buy_orders = self.order_books[symbol]['BUY']
         sell_orders = self.order_books[symbol]['SELL']
         
         matches_found = 0
-        while buy_orders and sell_orders:
-            best_buy = buy_orders[0]
-            best_sell = sell_orders[0]
+        # Match while the book is crossed (buy price >= sell price)
+        while self._best_bid[symbol] >= self._best_ask[symbol]:
+            # Remove matched orders
+            buy_entry = heapq.heappop(buy_orders)
+            sell_entry = heapq.heappop(sell_orders)
+            buy_order = buy_entry[2]
+            sell_order = sell_entry[2]
             
-            # Check if orders can match (buy price >= sell price)
-            if best_buy.price >= best_sell.price:
-                # Remove matched orders
-                buy_order = heapq.heappop(buy_orders)
-                sell_order = heapq.heappop(sell_orders)
-                
-                # Execute trade
-                trade_price = (buy_order.price + sell_order.price) / 2
-                trade_quantity = min(buy_order.quantity, sell_order.quantity)
-                
-                # Update stock price based on trade
-                self.stocks[symbol].update_price(trade_price, trade_quantity)
-                self._update_market_heaps(symbol)
-                
-                # Update user portfolio if they were involved
-                if buy_order.user_id == "USER":
-                    total_cost = trade_price * trade_quantity
-                    self.user_cash -= total_cost
-                    self.user_portfolio[symbol] += trade_quantity
-                
-                if sell_order.user_id == "USER":
-                    total_revenue = trade_price * trade_quantity
-                    self.user_cash += total_revenue
-                    self.user_portfolio[symbol] -= trade_quantity
-                
-                matches_found += 1
-                self.trades_executed += 1
-                
-                print(f"🎯 ORDER MATCHED: {trade_quantity} shares of {symbol} at ${trade_price:.2f}")
-                
-                # Handle partial fills
-                if buy_order.quantity > trade_quantity:
-                    buy_order.quantity -= trade_quantity
-                    heapq.heappush(buy_orders, buy_order)
-                
-                if sell_order.quantity > trade_quantity:
-                    sell_order.quantity -= trade_quantity
-                    heapq.heappush(sell_orders, sell_order)
-                
-                # Check price alerts
-                self._check_price_alerts(symbol, trade_price)
+            # Execute trade
+            trade_price = (sell_entry[0] - buy_entry[0]) / 2
+            trade_quantity = min(buy_order.quantity, sell_order.quantity)
+            
+            # Update stock price based on trade
+            self._apply_price(symbol, trade_price, trade_quantity)
+            
+            # Update user portfolio if they were involved
+            if buy_order.user_id == "USER":
+                total_cost = trade_price * trade_quantity
+                self.user_cash -= total_cost
+                self._adjust_position(symbol, trade_quantity)
+            
+            if sell_order.user_id == "USER":
+                total_revenue = trade_price * trade_quantity
+                self.user_cash += total_revenue
+                self._adjust_position(symbol, -trade_quantity)
+            
+            matches_found += 1
+            self.trades_executed += 1
+            
+            print(f"🎯 ORDER MATCHED: {trade_quantity} shares of {symbol} at ${trade_price:.2f}")
+            
+            # Handle partial fills
+            if buy_order.quantity > trade_quantity:
+                buy_order.quantity -= trade_quantity
+                heapq.heappush(buy_orders, buy_entry)
             else:
-                break
+                self._release_order(buy_order)
+            
+            if sell_order.quantity > trade_quantity:
+                sell_order.quantity -= trade_quantity
+                heapq.heappush(sell_orders, sell_entry)
+            else:
+                self._release_order(sell_order)
+            
+            self._refresh_best_prices(symbol)
+            
+            # Check price alerts
+            self._check_price_alerts(symbol, trade_price)
         
         if matches_found > 0:
             print(f"📊 {matches_found} order(s) matched for {symbol}")
@@ -433,10 +621,15 @@ class InteractiveStockTicker:
             print(f"❌ Stock {symbol} not found!")
             return False
         
+        if alert_type not in ('ABOVE', 'BELOW'):
+            print(f"❌ Alert type must be ABOVE or BELOW!")
+            return False
+        
         alert_id = f"ALERT_{symbol}_{int(time.time())}"
         alert = PriceAlert(alert_id, symbol, target_price, alert_type)
         
-        heapq.heappush(self.price_alerts, alert)
+        key = target_price if alert_type == 'ABOVE' else -target_price
+        heapq.heappush(self.price_alerts[symbol][alert_type], (key, alert))
         self.total_operations += 1
         
         print(f"🔔 Alert set: {symbol} {alert_type} ${target_price:.2f}")
@@ -444,77 +637,84 @@ class InteractiveStockTicker:
     
     def _check_price_alerts(self, symbol: str, current_price: float):
         """Check price alerts for triggers"""
-        triggered_count = 0
-        remaining_alerts = []
+        alerts = self.price_alerts.get(symbol)
+        if not alerts:
+            return 0
+        
+        triggered = []
         
-        while self.price_alerts:
-            alert = heapq.heappop(self.price_alerts)
-            if alert.symbol == symbol and alert.check_trigger(current_price):
-                self.triggered_alerts.append(alert)
-                print(f"🚨 ALERT TRIGGERED: {symbol} hit ${current_price:.2f} (Target: {alert.alert_type} ${alert.target_price:.2f})")
-                triggered_count += 1
-            elif not alert.triggered:
-                remaining_alerts.append(alert)
+        # Peek at each root and pop only while it fires
+        above = alerts['ABOVE']
+        while above and above[0][0] <= current_price:
+            triggered.append(heapq.heappop(above)[1])
         
-        # Restore non-triggered alerts
-        for alert in remaining_alerts:
-            heapq.heappush(self.price_alerts, alert)
+        below = alerts['BELOW']
+        while below and -below[0][0] >= current_price:
+            triggered.append(heapq.heappop(below)[1])
         
-        return triggered_count
+        for alert in triggered:
+            alert.check_trigger(current_price)
+            self.triggered_alerts.append(alert)
+            print(f"🚨 ALERT TRIGGERED: {symbol} hit ${current_price:.2f} (Target: {alert.alert_type} ${alert.target_price:.2f})")
+        
+        self.total_operations += len(triggered)
+        return len(triggered)
     
     def start_market_simulation(self):
-        """Start background market simulation"""
+        """Start market simulation as a task on the running event loop"""
         if self.market_open:
             print("⚠️  Market is already open!")
             return
         
-        self.market_open = True
-        
-        def simulate_market():
-            while self.market_open:
-                # Randomly update 2-3 stock prices
-                symbols_to_update = random.sample(list(self.stocks.keys()), random.randint(2, 4))
-                
-                for symbol in symbols_to_update:
-                    stock = self.stocks[symbol]
-                    # Random price movement (-3% to +3%)
-                    change_pct = random.uniform(-3, 3)
-                    new_price = stock.current_price * (1 + change_pct / 100)
-                    new_price = max(new_price, 1.0)  # Don't let stocks go below $1
-                    
-                    volume = random.randint(1000, 50000)
-                    stock.update_price(new_price, volume)
-                    
-                    self._update_market_heaps(symbol)
-                    self._check_price_alerts(symbol, new_price)
-                
-                # Process some AI orders to create market activity
-                self._generate_ai_orders()
-                
-                time.sleep(3)  # Update every 3 seconds
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            print("❌ The market simulation needs a running session (run_interactive_session)!")
+            return
         
-        self.simulation_thread = threading.Thread(target=simulate_market)
-        self.simulation_thread.daemon = True
-        self.simulation_thread.start()
+        self.simulation_task = loop.create_task(self._simulate_market())
+        self.market_open = True
         
         print("🟢 Market opened! Prices will update automatically every 3 seconds.")
     
+    async def _simulate_market(self):
+        """Market simulation loop, interleaved with user commands on the event loop"""
+        while self.market_open:
+            # Randomly move 2-4 stock prices in one pass over the price array,
+            # then fan the new prices out to the Stock objects
+            for row, volume in random_walk(self._prices, random.randint(2, 4)):
+                symbol = self._symbol_list[row]
+                new_price = self._prices[row]
+                self._apply_price(symbol, new_price, volume)
+                self._check_price_alerts(symbol, new_price)
+            
+            # Process some AI orders to create market activity
+            self._generate_ai_orders()
+            
+            # Fold this tick's price moves into the market ranking and analytics once
+            self._refresh_market_movers()
+            self._compute_analytics()
+            
+            await asyncio.sleep(3)  # Update every 3 seconds
+    
     def _generate_ai_orders(self):
         """Generate AI orders to create market activity"""
         if random.random() < 0.3:  # 30% chance to place AI orders
-            symbol = random.choice(list(self.stocks.keys()))
+            symbol = random.choice(self._symbol_list)
             stock = self.stocks[symbol]
             
-            order_type = random.choice(['BUY', 'SELL'])
+            order_type = random.choice(('BUY', 'SELL'))
             # AI orders are slightly away from current price
             price_offset = random.uniform(-2, 2)  # Within 2% of current price
             order_price = stock.current_price * (1 + price_offset / 100)
             quantity = random.randint(10, 100)
             
             order_id = f"AI_{order_type}_{symbol}_{int(time.time())}"
-            order = OrderBookEntry(order_id, symbol, order_type, order_price, quantity, "AI")
+            order = self._acquire_order(order_id, symbol, order_type, order_price, quantity, "AI")
             
-            heapq.heappush(self.order_books[symbol][order_type], order)
+            key = BOOK_SIGN[order_type] * order_price
+            heapq.heappush(self.order_books[symbol][order_type], (key, next(self._order_seq), order))
+            self._refresh_best_prices(symbol)
             self._match_orders(symbol)
     
     def stop_market_simulation(self):
@@ -524,14 +724,15 @@ class InteractiveStockTicker:
             return
         
         self.market_open = False
-        if self.simulation_thread:
-            self.simulation_thread.join(timeout=1)
+        if self.simulation_task:
+            self.simulation_task.cancel()
+            self.simulation_task = None
         print("🔴 Market closed!")
     
     def display_portfolio(self):
         """Display user's portfolio"""
-        print("\n💼 YOUR PORTFOLIO:")
-        print("-" * 50)
+        self._println("\n💼 YOUR PORTFOLIO:")
+        self._println("-" * 50)
         total_value = 0
         
         for symbol, quantity in self.user_portfolio.items():
@@ -539,13 +740,15 @@ class InteractiveStockTicker:
                 current_price = self.stocks[symbol].current_price
                 position_value = current_price * quantity
                 total_value += position_value
-                print(f"  {symbol}: {quantity} shares @ ${current_price:.2f} = ${position_value:,.2f}")
+                self._println(f"  {symbol}: {quantity} shares @ ${current_price:.2f} = ${position_value:,.2f}")
         
-        print(f"\nCash: ${self.user_cash:,.2f}")
-        print(f"Total Portfolio Value: ${total_value + self.user_cash:,.2f}")
+        self._println(f"\nCash: ${self.user_cash:,.2f}")
+        self._println(f"Total Portfolio Value: ${total_value + self.user_cash:,.2f}")
         
         if self.transaction_history:
-            print(f"\nRecent Transactions: {len(self.transaction_history)}")
+            self._println(f"\nRecent Transactions: {len(self.transaction_history)}")
+        
+        self._flush()
     
     def display_order_book(self, symbol: str):
         """Display order book for a symbol"""
@@ -553,42 +756,75 @@ class InteractiveStockTicker:
             print(f"❌ Stock {symbol} not found!")
             return
         
-        print(f"\n📋 ORDER BOOK FOR {symbol}:")
-        print("-" * 40)
+        self._println(f"\n📋 ORDER BOOK FOR {symbol}:")
+        self._println("-" * 40)
         
-        # Show buy orders (highest price first)
-        buy_orders = sorted(self.order_books[symbol]['BUY'], reverse=True)[:5]
-        print("BUY ORDERS (Best 5):")
-        for i, order in enumerate(buy_orders, 1):
-            print(f"  {i}. ${order.price:.2f} x {order.quantity} ({order.user_id})")
+        # Show buy orders (highest price first; keys are -price so smallest is best)
+        buy_orders = heapq.nsmallest(5, self.order_books[symbol]['BUY'])
+        self._println("BUY ORDERS (Best 5):")
+        for i, (_, _, order) in enumerate(buy_orders, 1):
+            self._println(f"  {i}. ${order.price:.2f} x {order.quantity} ({order.user_id})")
         
         if not buy_orders:
-            print("  No buy orders")
+            self._println("  No buy orders")
         
         # Show current price
         current_price = self.stocks[symbol].current_price
-        print(f"\n  --> CURRENT PRICE: ${current_price:.2f} <--")
+        self._println(f"\n  --> CURRENT PRICE: ${current_price:.2f} <--")
         
         # Show sell orders (lowest price first)
-        sell_orders = sorted(self.order_books[symbol]['SELL'])[:5]
-        print("\nSELL ORDERS (Best 5):")
-        for i, order in enumerate(sell_orders, 1):
-            print(f"  {i}. ${order.price:.2f} x {order.quantity} ({order.user_id})")
+        sell_orders = heapq.nsmallest(5, self.order_books[symbol]['SELL'])
+        self._println("\nSELL ORDERS (Best 5):")
+        for i, (_, _, order) in enumerate(sell_orders, 1):
+            self._println(f"  {i}. ${order.price:.2f} x {order.quantity} ({order.user_id})")
         
         if not sell_orders:
-            print("  No sell orders")
+            self._println("  No sell orders")
+        
+        self._flush()
     
     def display_statistics(self):
         """Display system statistics"""
-        print(f"\n📈 SYSTEM STATISTICS:")
-        print(f"  Total Heap Operations: {self.total_operations:,}")
-        print(f"  Orders Placed: {self.orders_placed}")
-        print(f"  Trades Executed: {self.trades_executed}")
-        print(f"  Active Price Alerts: {len(self.price_alerts)}")
-        print(f"  Triggered Alerts: {len(self.triggered_alerts)}")
+        self._println(f"\n📈 SYSTEM STATISTICS:")
+        self._println(f"  Total Heap Operations: {self.total_operations:,}")
+        self._println(f"  Orders Placed: {self.orders_placed}")
+        self._println(f"  Trades Executed: {self.trades_executed}")
+        self._println(f"  Active Price Alerts: {sum(len(alerts['ABOVE']) + len(alerts['BELOW']) for alerts in self.price_alerts.values())}")
+        self._println(f"  Triggered Alerts: {len(self.triggered_alerts)}")
+        
+        self._flush()
+    
+    async def _ainput(self, prompt: str) -> str:
+        """Read a line from stdin without blocking the event loop"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        
+        def settle(method, value):
+            if not future.done():
+                method(value)
+        
+        def read_line():
+            # Daemon thread so a pending read never holds up interpreter exit
+            try:
+                line = input(prompt)
+            except Exception as e:
+                loop.call_soon_threadsafe(settle, future.set_exception, e)
+            else:
+                loop.call_soon_threadsafe(settle, future.set_result, line)
+        
+        threading.Thread(target=read_line, daemon=True).start()
+        return await future
     
     def run_interactive_session(self):
         """Main interactive loop"""
+        try:
+            asyncio.run(self._interactive_session())
+        except KeyboardInterrupt:
+            print("\n\n👋 Goodbye!")
+            self.stop_market_simulation()
+    
+    async def _interactive_session(self):
+        """Command loop; shares the event loop with the market simulation task"""
         print("🎮 Welcome to the Interactive Stock Ticker!")
         print("This system demonstrates heap data structures in a real stock trading environment.")
         print("\nType 'help' to see available commands.")
@@ -596,7 +832,7 @@ class InteractiveStockTicker:
         while True:
             try:
                 print("\n" + "="*60)
-                command = input("📝 Enter command (or 'help'): ").strip().lower()
+                command = (await self._ainput("📝 Enter command (or 'help'): ")).strip().lower()
                 
                 if command == 'help' or command == 'h':
                     self.show_help()
@@ -653,7 +889,7 @@ class InteractiveStockTicker:
                 else:
                     print("❌ Unknown command. Type 'help' for available commands.")
                 
-            except KeyboardInterrupt:
+            except EOFError:
                 print("\n\n👋 Goodbye!")
                 self.stop_market_simulation()
                 break